@@ -0,0 +1,92 @@
+import json
+import os
+import socket
+import sys
+
+# Keep this module free of project.py's imports: it only forwards commands to the daemon.
+SOCKET_ENV_VAR = "ADCALENDAR_SOCKET"
+SOCKET_PATH = "adcalendar.sock"
+USAGE = """Usage: python client.py list
+       python client.py read <calendar> <day>
+       python client.py edit <calendar> <day> <data>
+       python client.py render <calendar>
+Start the daemon first with: python project.py --daemon"""
+
+
+def main():
+    """
+    Acts as the entry point of the client. Sends the command given on the command line
+    to the daemon (python project.py --daemon) and prints its answer.
+    """
+    try:
+        request = build_request(sys.argv[1:])
+    except ValueError:
+        sys.exit(USAGE)
+
+    socket_path = os.environ.get(SOCKET_ENV_VAR, SOCKET_PATH)
+    try:
+        response = send_request(request, socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        sys.exit(f"No daemon listening on {socket_path}. {USAGE.splitlines()[-1]}")
+
+    if not response["ok"]:
+        sys.exit(response["error"])
+    result = response["result"]
+    if request["command"] == "list":
+        print("\n".join(result))
+    elif request["command"] == "read":
+        # Large entries are sent page by page
+        print(result["data"], end="", flush=True)
+        while result["offset"] < result["size"]:
+            request["offset"] = result["offset"]
+            response = send_request(request, socket_path)
+            if not response["ok"]:
+                sys.exit(response["error"])
+            result = response["result"]
+            print(result["data"], end="", flush=True)
+        print()
+    else:
+        print(result)
+
+
+def build_request(args: list) -> dict:
+    """
+    A function to build a daemon request from command line arguments.
+    :param args: Command line arguments without the program name
+    :type args: list containing str
+    :return: The request
+    :rtype: dict
+    """
+    if args == ["list"]:
+        return {"command": "list"}
+    elif len(args) == 2 and args[0] == "render":
+        return {"command": "render", "name": args[1]}
+    elif len(args) == 3 and args[0] == "read":
+        return {"command": "read", "name": args[1], "day": int(args[2])}
+    elif len(args) == 4 and args[0] == "edit":
+        return {"command": "edit", "name": args[1], "day": int(args[2]), "data": args[3]}
+    raise ValueError("Invalid command")
+
+
+def send_request(request: dict, socket_path: str) -> dict:
+    """
+    A function to send a request to the daemon and wait for its answer.
+    :param request: The request
+    :param socket_path: Path of the daemon's Unix domain socket
+    :type request: dict
+    :type socket_path: str
+    :return: The daemon's answer
+    :rtype: dict
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with client.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        return {"ok": False, "error": "The daemon closed the connection without answering."}
+    return json.loads(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,601 @@ import sys
 import calendar
 import re
 import json
+import os
+import time
+import atexit
+import cProfile
+import functools
+import contextlib
+import hashlib
+import bisect
+import socketserver
+import signal
+import shutil
+import tempfile
+import copy
+import stat
+import socket
 from tabulate import tabulate
 import pyfiglet
 
-# import os
 import jsonlines
 
 
+class Profiler:
+    ENV_VAR = "ADCALENDAR_PROFILE"
+    REPORT_PATH = "profile_report.json"
+    CPROFILE_PATH = "profile_action.prof"
+
+    def __init__(self: object, enabled=False, report_path=REPORT_PATH):
+        """
+        An instanced method to initialize class Profiler
+        :param self: Expects instance of class Profiler
+        :param enabled: Collect timers and counters if True
+        :param report_path: File the JSON report is dumped to at exit
+        :type self: object
+        :type enabled: bool
+        :type report_path: str
+        """
+        self.enabled = enabled
+        self.report_path = report_path
+        self.cprofile_action = None
+        self.stats = {}
+        self._registered = False
+
+    def configure(self: object, argv: list):
+        """
+        Enables profiling from the environment (ADCALENDAR_PROFILE=1) or the command line.
+        Supported flags: --profile, --profile-report=<path>, --cprofile=<menu option>
+        Registers the report dump at exit once profiling is enabled.
+        :param self: Expects instance of class Profiler
+        :param argv: Command line arguments without the program name
+        :type self: object
+        :type argv: list containing str
+        """
+        env_value = os.environ.get(self.ENV_VAR, "")
+        if env_value and env_value != "0":
+            self.enabled = True
+        for arg in argv:
+            if arg == "--profile":
+                self.enabled = True
+            elif arg.startswith("--profile-report="):
+                self.enabled = True
+                self.report_path = arg.split("=", 1)[1]
+            elif arg.startswith("--cprofile="):
+                self.enabled = True
+                self.cprofile_action = arg.split("=", 1)[1]
+        if self.enabled and not self._registered:
+            atexit.register(self.dump)
+            self._registered = True
+
+    def timed(self: object, func):
+        """
+        Decorator counting calls and wall time of the decorated function under its own name.
+        :param self: Expects instance of class Profiler
+        :param func: Function to instrument
+        :type self: object
+        :type func: function
+        :return: The wrapped function
+        :rtype: function
+        """
+        return self.timed_as(func.__name__)(func)
+
+    def timed_as(self: object, name: str):
+        """
+        Decorator factory counting calls and wall time of the decorated function under name.
+        When profiling is disabled the call is forwarded after a single flag check.
+        :param self: Expects instance of class Profiler
+        :param name: Name the stats are reported under
+        :type self: object
+        :type name: str
+        :return: The decorator
+        :rtype: function
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.count(name, calls=1, wall_time=time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def count(self: object, name: str, **counters):
+        """
+        Adds the given counters (e.g. bytes_read, bytes_written, records_parsed) to the stats of name.
+        :param self: Expects instance of class Profiler
+        :param name: Name of the instrumented function
+        :type self: object
+        :type name: str
+        """
+        entry = self.stats.setdefault(
+            name,
+            {
+                "calls": 0,
+                "wall_time": 0.0,
+                "bytes_read": 0,
+                "bytes_written": 0,
+                "records_parsed": 0,
+            },
+        )
+        for counter, value in counters.items():
+            entry[counter] = entry.get(counter, 0) + value
+
+    def report(self: object) -> dict:
+        """
+        Builds the profiling report.
+        :param self: Expects instance of class Profiler
+        :type self: object
+        :return: Stats per instrumented function
+        :rtype: dict
+        """
+        return {name: dict(entry) for name, entry in sorted(self.stats.items())}
+
+    def dump(self: object):
+        """
+        Writes the profiling report as JSON to report_path.
+        :param self: Expects instance of class Profiler
+        :type self: object
+        """
+        with open(self.report_path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    @contextlib.contextmanager
+    def capture(self: object, action):
+        """
+        Context manager running a cProfile capture around the selected menu action.
+        Only the first run of the action given by --cprofile is captured.
+        :param self: Expects instance of class Profiler
+        :param action: The menu option being executed
+        :type self: object
+        :type action: int or str
+        """
+        if not self.enabled or self.cprofile_action != str(action):
+            yield
+            return
+        self.cprofile_action = None
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(self.CPROFILE_PATH)
+
+
+PROFILER = Profiler()
+
+
+class ChunkStore:
+    CHUNKS_DIR = "chunks"
+    CHUNK_SIZE = 64 * 1024
+    INLINE_LIMIT = 4 * 1024
+    PREVIEW_LENGTH = 80
+
+    def __init__(self: object, path=CHUNKS_DIR):
+        """
+        An instanced method to initialize class ChunkStore.
+        Large day entries are split into content-addressed chunks stored outside of data.json.
+        REFS counts the references to each chunk from data.json and from history entries.
+        A chunk is removed once its count drops to zero.
+        :param self: Expects instance of class ChunkStore
+        :param path: Folder the chunks are stored in
+        :type self: object
+        :type path: str
+        """
+        self.path = path
+
+    def _chunk_path(self: object, digest: str) -> str:
+        return os.path.join(self.path, f"{digest}.txt")
+
+    def _read_refs(self: object) -> dict:
+        try:
+            with open(os.path.join(self.path, "REFS"), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_refs(self: object, refs: dict):
+        os.makedirs(self.path, exist_ok=True)
+        write_atomic(os.path.join(self.path, "REFS"), json.dumps(refs))
+
+    def digests(self: object, items) -> list:
+        """
+        Lists the chunks referenced by day entries.
+        :param self: Expects instance of class ChunkStore
+        :param items: Day entries
+        :type self: object
+        :type items: iterable of str or dict
+        :return: Digests of the referenced chunks
+        :rtype: list containing str
+        """
+        return [
+            digest for item in items if isinstance(item, dict) for digest in item["chunks"]
+        ]
+
+    def calendar_digests(self: object, calendar_data: dict) -> list:
+        """
+        Lists the chunks referenced by the day entries of a calendar.
+        :param self: Expects instance of class ChunkStore
+        :param calendar_data: Data associated with the days of a calendar
+        :type self: object
+        :type calendar_data: dict
+        :return: Digests of the referenced chunks
+        :rtype: list containing str
+        """
+        return [
+            digest for entries in calendar_data.values() for digest in self.digests(entries)
+        ]
+
+    def acquire(self: object, digests: list):
+        """
+        Adds a reference to each chunk. Has to be called before the reference is written,
+        so a crash can only leave chunks over-counted.
+        :param self: Expects instance of class ChunkStore
+        :param digests: Digests of the referenced chunks
+        :type self: object
+        :type digests: list containing str
+        """
+        if not digests:
+            return
+        refs = self._read_refs()
+        for digest in digests:
+            refs[digest] = refs.get(digest, 0) + 1
+        self._write_refs(refs)
+
+    def release(self: object, digests: list):
+        """
+        Removes a reference from each chunk and deletes chunks no longer referenced.
+        Has to be called after the reference has been removed. Unknown chunks are left alone.
+        :param self: Expects instance of class ChunkStore
+        :param digests: Digests of the chunks no longer referenced
+        :type self: object
+        :type digests: list containing str
+        """
+        if not digests:
+            return
+        refs = self._read_refs()
+        unreferenced = []
+        for digest in digests:
+            if digest not in refs:
+                continue
+            refs[digest] -= 1
+            if refs[digest] == 0:
+                del refs[digest]
+                unreferenced.append(digest)
+        self._write_refs(refs)
+        for digest in unreferenced:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._chunk_path(digest))
+
+    def externalize(self: object, item):
+        """
+        Moves an entry larger than INLINE_LIMIT out of line.
+        Smaller entries and entries which are already stored out of line are returned unchanged.
+        :param self: Expects instance of class ChunkStore
+        :param item: A day entry
+        :type self: object
+        :type item: str or dict
+        :return: The entry or a reference holding its size, a preview and its chunks
+        :rtype: str or dict
+        """
+        if not isinstance(item, str) or len(item) <= self.INLINE_LIMIT:
+            return item
+
+        os.makedirs(self.path, exist_ok=True)
+        chunks = []
+        for start in range(0, len(item), self.CHUNK_SIZE):
+            chunk = item[start : start + self.CHUNK_SIZE]
+            digest = hashlib.sha1(chunk.encode("utf-8")).hexdigest()
+            chunk_path = self._chunk_path(digest)
+            if not os.path.exists(chunk_path):
+                write_atomic(chunk_path, chunk)
+            chunks.append(digest)
+        return {
+            "size": len(item),
+            "preview": item[: self.PREVIEW_LENGTH],
+            "chunks": chunks,
+        }
+
+    def size(self: object, item) -> int:
+        """
+        Gets the length of a day entry without reading its chunks.
+        :param self: Expects instance of class ChunkStore
+        :param item: A day entry
+        :type self: object
+        :type item: str or dict
+        :return: Length of the entry's text
+        :rtype: int
+        """
+        return item["size"] if isinstance(item, dict) else len(item)
+
+    def preview(self: object, item) -> str:
+        """
+        Gets the beginning of a day entry without reading its chunks.
+        :param self: Expects instance of class ChunkStore
+        :param item: A day entry
+        :type self: object
+        :type item: str or dict
+        :return: The first PREVIEW_LENGTH characters of the entry
+        :rtype: str
+        """
+        return item["preview"] if isinstance(item, dict) else item[: self.PREVIEW_LENGTH]
+
+    def iter_text(self: object, item, offset=0):
+        """
+        Yields the text of a day entry chunk by chunk, reading chunks only when needed.
+        Chunks before offset are skipped without being read.
+        :param self: Expects instance of class ChunkStore
+        :param item: A day entry
+        :param offset: Position in the entry's text to start at
+        :type self: object
+        :type item: str or dict
+        :type offset: int
+        :return: Parts of the entry's text
+        :rtype: generator of str
+        """
+        if not isinstance(item, dict):
+            yield item[offset:]
+            return
+        first_chunk, offset = divmod(offset, self.CHUNK_SIZE)
+        for digest in item["chunks"][first_chunk:]:
+            with open(self._chunk_path(digest), "r", encoding="utf-8") as f:
+                yield f.read()[offset:]
+            offset = 0
+
+
+CHUNK_STORE = ChunkStore()
+
+
+class CalendarHistory:
+    HISTORY_DIR = "history"
+    KEEP_VERSIONS = 50
+
+    def __init__(self: object, name: str, keep=KEEP_VERSIONS):
+        """
+        An instanced method to initialize class CalendarHistory.
+        Every saved version of a calendar is a small manifest mapping days to content hashes.
+        Day entries are stored once per content in objects/, so unchanged days are shared between versions.
+        REFS counts how many retained versions reference each entry, so pruning never rescans the history.
+        :param self: Expects instance of class CalendarHistory
+        :param name: Name of the calendar
+        :param keep: Amount of versions kept by the retention policy
+        :type self: object
+        :type name: str
+        :type keep: int
+        """
+        self.name = name
+        self.keep = keep
+        safe_name = re.sub(r"[^\w.-]", "_", name)
+        name_hash = hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+        self.path = os.path.join(self.HISTORY_DIR, f"{safe_name}-{name_hash}")
+        self.objects_path = os.path.join(self.path, "objects")
+
+    def _manifest_path(self: object, version: int) -> str:
+        return os.path.join(self.path, f"v{version}.json")
+
+    def _object_path(self: object, digest: str) -> str:
+        return os.path.join(self.objects_path, f"{digest}.json")
+
+    def _read_head(self: object) -> dict:
+        try:
+            with open(os.path.join(self.path, "HEAD"), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"head": 0, "oldest": 1}
+
+    def _write_head(self: object, head: dict):
+        write_atomic(os.path.join(self.path, "HEAD"), json.dumps(head))
+
+    def _read_manifest(self: object, version: int) -> dict:
+        with open(self._manifest_path(version), "r") as f:
+            return json.load(f)
+
+    def _read_refs(self: object) -> dict:
+        try:
+            with open(os.path.join(self.path, "REFS"), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_refs(self: object, refs: dict):
+        write_atomic(os.path.join(self.path, "REFS"), json.dumps(refs))
+
+    def commit(self: object, adCalendar: object) -> int:
+        """
+        Stores the current state of a calendar as a new version.
+        Only day entries whose content has not been stored before are written.
+        REFS is written before HEAD, so a crash can only leave entries over-counted, never removed too early.
+        Prunes versions beyond the retention policy afterwards.
+        :param self: Expects instance of class CalendarHistory
+        :param adCalendar: The calendar to snapshot
+        :type self: object
+        :type adCalendar: object
+        :return: The new version number
+        :rtype: int
+        """
+        os.makedirs(self.objects_path, exist_ok=True)
+        head = self._read_head()
+        refs = self._read_refs()
+        version = head["head"] + 1
+
+        days = {}
+        for day, entry in adCalendar.calendar_data.items():
+            serialized = json.dumps(entry)
+            digest = hashlib.sha1(serialized.encode("utf-8")).hexdigest()
+            object_path = self._object_path(digest)
+            if not os.path.exists(object_path):
+                CHUNK_STORE.acquire(CHUNK_STORE.digests(entry))
+                write_atomic(object_path, serialized)
+            days[day] = digest
+
+        manifest = {
+            "version": version,
+            "timestamp": time.time(),
+            "name": adCalendar.name,
+            "_month": adCalendar.month,
+            "_year": adCalendar.year,
+            "days": adCalendar.days,
+            "_daysmonth": adCalendar.daysmonth,
+            "calendar_data": days,
+        }
+        write_atomic(self._manifest_path(version), json.dumps(manifest))
+
+        for digest in days.values():
+            refs[digest] = refs.get(digest, 0) + 1
+        self._write_refs(refs)
+        head["head"] = version
+        self._write_head(head)
+        self.prune(refs)
+        return version
+
+    def is_empty(self: object) -> bool:
+        """
+        Checks if any version of the calendar has been stored.
+        :param self: Expects instance of class CalendarHistory
+        :type self: object
+        :return: No version stored
+        :rtype: bool
+        """
+        return self._read_head()["head"] == 0
+
+    def versions(self: object) -> list:
+        """
+        Lists the retained versions of the calendar.
+        :param self: Expects instance of class CalendarHistory
+        :type self: object
+        :return: Tuples of version number and timestamp, oldest first
+        :rtype: list containing tuple
+        """
+        head = self._read_head()
+        return [
+            (version, self._read_manifest(version)["timestamp"])
+            for version in range(head["oldest"], head["head"] + 1)
+        ]
+
+    def version_at(self: object, timestamp: float) -> int:
+        """
+        Finds the latest version saved at or before timestamp using a binary search over the manifests.
+        :param self: Expects instance of class CalendarHistory
+        :param timestamp: Point in time as seconds since the epoch
+        :type self: object
+        :type timestamp: float
+        :return: The version number
+        :rtype: int
+        """
+        head = self._read_head()
+        retained = range(head["oldest"], head["head"] + 1)
+        index = bisect.bisect_right(
+            retained,
+            timestamp,
+            key=lambda version: self._read_manifest(version)["timestamp"],
+        )
+        if index == 0:
+            raise ValueError("No version saved at that time")
+        return retained[index - 1]
+
+    def load(self: object, version=None, timestamp=None) -> object:
+        """
+        Loads a calendar as of a version or a point in time. Defaults to the latest version.
+        Reads one manifest and one object per day, independent of the length of the history.
+        :param self: Expects instance of class CalendarHistory
+        :param version: Version number to load
+        :param timestamp: Point in time (seconds since the epoch) to load
+        :type self: object
+        :type version: int
+        :type timestamp: float
+        :return: A Calendar object
+        :rtype: object
+        """
+        head = self._read_head()
+        if timestamp is not None:
+            version = self.version_at(timestamp)
+        elif version is None:
+            version = head["head"]
+        if not head["oldest"] <= version <= head["head"]:
+            raise ValueError(f"Version {version} does not exist")
+
+        manifest = self._read_manifest(version)
+        calendar_data = {}
+        for day, digest in manifest["calendar_data"].items():
+            with open(self._object_path(digest), "r") as f:
+                calendar_data[day] = json.load(f)
+
+        return Calendar(
+            manifest["name"],
+            manifest["_month"],
+            manifest["_year"],
+            manifest["_daysmonth"],
+            manifest["days"],
+            calendar_data,
+        )
+
+    def prune(self: object, refs=None):
+        """
+        Removes versions beyond the retention policy (keep) and the day entries no longer referenced.
+        Only the manifests of the removed versions are read.
+        HEAD and REFS are updated before files are removed, so a crash can only leave files behind.
+        :param self: Expects instance of class CalendarHistory
+        :param refs: Reference counts of the day entries, read from REFS if not given
+        :type self: object
+        :type refs: dict
+        """
+        if refs is None:
+            refs = self._read_refs()
+        head = self._read_head()
+        oldest = max(head["oldest"], head["head"] - self.keep + 1)
+        if oldest == head["oldest"]:
+            return
+
+        pruned = range(head["oldest"], oldest)
+        head["oldest"] = oldest
+        self._write_head(head)
+
+        unreferenced = []
+        for version in pruned:
+            for digest in self._read_manifest(version)["calendar_data"].values():
+                # Entries missing from REFS are left alone rather than removed early
+                if digest not in refs:
+                    continue
+                refs[digest] -= 1
+                if refs[digest] == 0:
+                    del refs[digest]
+                    unreferenced.append(digest)
+        self._write_refs(refs)
+
+        chunks = []
+        for digest in unreferenced:
+            with open(self._object_path(digest), "r") as f:
+                chunks.extend(CHUNK_STORE.digests(json.load(f)))
+            os.remove(self._object_path(digest))
+        for version in pruned:
+            os.remove(self._manifest_path(version))
+        CHUNK_STORE.release(chunks)
+
+    def delete(self: object):
+        """
+        Removes all versions of the calendar, so a new calendar with the same name starts without history.
+        Releases the chunks referenced by its entries afterwards.
+        :param self: Expects instance of class CalendarHistory
+        :type self: object
+        """
+        chunks = []
+        if os.path.isdir(self.objects_path):
+            for filename in os.listdir(self.objects_path):
+                with open(os.path.join(self.objects_path, filename), "r") as f:
+                    chunks.extend(CHUNK_STORE.digests(json.load(f)))
+        shutil.rmtree(self.path, ignore_errors=True)
+        CHUNK_STORE.release(chunks)
+
+
 class Calendar:
     MONTH_REGEX = r"^(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|(Nov|Dec)(?:ember)?)$"
     YEAR_REGEX = r"^(19|20)\d{2}$"
@@ -146,29 +734,108 @@ class Calendar:
             except ValueError as e:
                 print(e)
 
-    def get_data_for_day(self: object, day: int) -> str:
+    def get_data_for_day(self: object, day: int):
         """
         Prints out data for a selected day. If there is no data, error will be printed.
+        The data is streamed page by page, so large entries are never held in memory in one piece.
         :param self: Expects instance of class Calendar
         :param day: Data to display data from
         :type self: object
         :type day: int
-        :return: For validation purposes: the data in said day
-        :rtype: str
+        :return: For validation purposes: the data in said day, or its length if larger than ChunkStore.INLINE_LIMIT
+        :rtype: str or int
         """
         day = str(day)
         if day in self.calendar_data:
             data = self.calendar_data[day]
             if data != [""]:
-                print(f"======> Data for day {day} in calendar {self.name}: {', '.join(data)}")
-                return f"{', '.join(data)}"
+                size = self.data_size(day)
+                print(f"======> Data for day {day} in calendar {self.name}: ", end="")
+                if size <= ChunkStore.INLINE_LIMIT:
+                    text = "".join(self.read_data_pages(day))
+                    print(text)
+                    return text
+                for page in self.read_data_pages(day):
+                    print(page, end="", flush=True)
+                print()
+                return size
             else:
                 print(f"No data found for day {day}")
                 return f"No data found for day {day}"
         else:
             print(f"No data stored for day {day}")
 
+    def data_size(self: object, day: int) -> int:
+        """
+        Gets the length of the data of a day, entries separated by ', ', without reading chunks.
+        :param self: Expects instance of class Calendar
+        :param day: Day to get the length of
+        :type self: object
+        :type day: int
+        :return: Length of the day's data
+        :rtype: int
+        """
+        items = self.calendar_data.get(str(day), [])
+        return sum(CHUNK_STORE.size(item) for item in items) + 2 * max(len(items) - 1, 0)
+
+    def read_data_pages(self: object, day: int, page_size=ChunkStore.CHUNK_SIZE, offset=0):
+        """
+        A paged reader for the data of a day. Entries stored out of line are read chunk by chunk.
+        Entries and chunks before offset are skipped without being read.
+        :param self: Expects instance of class Calendar
+        :param day: Day to read data from
+        :param page_size: Maximum length of a page
+        :param offset: Position in the day's data to start at
+        :type self: object
+        :type day: int
+        :type page_size: int
+        :type offset: int
+        :return: Pages of the day's data, entries separated by ', '
+        :rtype: generator of str
+        """
+        buffer = ""
+        for index, item in enumerate(self.calendar_data.get(str(day), [])):
+            if index:
+                buffer += ", "[offset:]
+                offset = max(offset - 2, 0)
+            size = CHUNK_STORE.size(item)
+            if offset >= size:
+                offset -= size
+                continue
+            for text in CHUNK_STORE.iter_text(item, offset):
+                buffer += text
+                while len(buffer) >= page_size:
+                    yield buffer[:page_size]
+                    buffer = buffer[page_size:]
+            offset = 0
+        if buffer:
+            yield buffer
+
+    def day_has_data(self: object, day: int) -> bool:
+        """
+        Checks if a day contains data without reading entries stored out of line.
+        :param self: Expects instance of class Calendar
+        :param day: Day to check
+        :type self: object
+        :type day: int
+        :return: Day contains data
+        :rtype: bool
+        """
+        return any(
+            isinstance(item, dict) or item.strip()
+            for item in self.calendar_data.get(str(day), [])
+        )
+
     def generate_month_table(self: object):
+        """
+        An instanced method to print a tabulated list of days, which form a calendar.
+        :param self: Expects instance of class Calendar
+        :type self: object
+        """
+        print(self.render_month_table())
+
+    @PROFILER.timed_as("generate_month_table")
+    def render_month_table(self: object) -> str:
         """
         An instanced method to generate a tabulated list of days, which form a calendar.
         If there is data in a day, an ! mark will be displayed to signify that.
@@ -176,6 +843,8 @@ class Calendar:
         Calculates on whick weekday the 1st day of the month happens.
         :param self: Expects instance of class Calendar
         :type self: object
+        :return: The calendar table with its heading
+        :rtype: str
         """
 
         header = ["Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
@@ -193,9 +862,7 @@ class Calendar:
         current_row = calendar_table[0]
 
         for day in range(1, num_days + 1):
-            day_str = str(day)
-            day_data = self.calendar_data.get(day_str, [])
-            if day_data and any(item.strip() for item in day_data):
+            if self.day_has_data(day):
                 day_display = f"{day}!"
             else:
                 day_display = str(day)
@@ -205,9 +872,16 @@ class Calendar:
                 calendar_table.append(["" for _ in range(7)])
                 current_row = calendar_table[-1]
 
-        print(f"\n****'!' marks days that contain data****")
-        print(f"Calendar '{self.name}' for {self.month}, {self.year}")
-        print(tabulate(calendar_table, headers=header, tablefmt="fancy_grid"))
+        if PROFILER.enabled:
+            PROFILER.count("generate_month_table", records_parsed=num_days)
+
+        return "\n".join(
+            [
+                f"\n****'!' marks days that contain data****",
+                f"Calendar '{self.name}' for {self.month}, {self.year}",
+                tabulate(calendar_table, headers=header, tablefmt="fancy_grid"),
+            ]
+        )
 
     def add_data_to_day(self: object, day: int, data: str):
         """
@@ -228,24 +902,42 @@ class Calendar:
 
         self.calendar_data[str(day)].append(data)
 
+    @PROFILER.timed
     def save_to_json(self: object):
         """
         An instanced method to save calendar data to json (data.json).
         Validates if there is an entry to update, otherwise appends.
+        Large entries are moved to the chunk store, data.json only keeps their size and a preview.
+        Chunks only referenced by the replaced entry are released.
+        Profiled bytes cover data.json, chunk and history files are reported under write_atomic.
+        Records the saved state as a new version in the calendar's history.
         :param self: Expects instance of class Calendar
         :type self: object
         """
         path = "data.json"
         updated = False
 
+        self.calendar_data = {
+            day: [CHUNK_STORE.externalize(item) for item in entries]
+            for day, entries in self.calendar_data.items()
+        }
+        CHUNK_STORE.acquire(CHUNK_STORE.calendar_digests(self.calendar_data))
+
         all_calendars = []
+        records_read = 0
+        bytes_read = 0
+        replaced = None
 
         try:
-            with jsonlines.open(path, mode="r") as reader:
-                for calendar in reader:
+            with open(path, "r") as reader:
+                for line in reader:
+                    calendar = json.loads(line)
+                    records_read += 1
+                    bytes_read += len(line.encode("utf-8"))
                     if calendar["name"] == self.name:
                         # Update the existing calendar with the current instance's data
                         all_calendars.append(self.__dict__)
+                        replaced = calendar
                         updated = True
                     else:
                         all_calendars.append(calendar)
@@ -258,6 +950,19 @@ class Calendar:
         with jsonlines.open(path, mode="w") as writer:
             writer.write_all(all_calendars)
 
+        if replaced is not None:
+            CHUNK_STORE.release(CHUNK_STORE.calendar_digests(replaced["calendar_data"]))
+
+        if PROFILER.enabled:
+            PROFILER.count(
+                "save_to_json",
+                records_parsed=records_read,
+                bytes_read=bytes_read,
+                bytes_written=os.path.getsize(path),
+            )
+
+        CalendarHistory(self.name).commit(self)
+
     def edit_data_for_day(self: object):
         """
         An instanced method to edit data of defined day of a loaded calendar.
@@ -274,17 +979,38 @@ class Calendar:
                 if day_select < 1 or day_select > self._daysmonth:
                     raise ValueError("Invalid day")
                 new_data = input("New data: ")
-                self.calendar_data[str(day_select)] = [new_data]
                 break
             except ValueError:
                 print("Please enter a valid int value")
                 pass
 
-        # Save the changes to the JSON file
-        self.save_to_json()
+        self.set_data_for_day(day_select, new_data)
 
         return self.calendar_data
 
+    def set_data_for_day(self: object, day: int, data: str):
+        """
+        An instanced method to replace the data of a day and save the calendar to data.json.
+        Calendars saved before history was kept get their current state recorded first.
+        :param self: Expects instance of class Calendar
+        :param day: Day to replace data of
+        :param data: New data of the day
+        :type self: object
+        :type day: int
+        :type data: str
+        """
+        if day < 1 or day > self._daysmonth:
+            raise ValueError("Invalid day")
+
+        history = CalendarHistory(self.name)
+        if history.is_empty():
+            history.commit(self)
+
+        self.calendar_data[str(day)] = [data]
+
+        # Save the changes to the JSON file
+        self.save_to_json()
+
     def enter_data(self: object, daysmonth: int):
         """
         A function to add data during calendar creation. Adapts to custom days, if given.
@@ -300,14 +1026,209 @@ class Calendar:
         self.generate_month_table()
 
     @staticmethod
+    @PROFILER.timed
     def delete_calendar(name: str):
+        """
+        A static method to delete a calendar from data.json together with its history and chunks.
+        :param name: Name of the calendar
+        :type name: str
+        """
         with open("data.json", "r") as f:
             lines = f.readlines()
 
+        bytes_written = 0
+        chunks = []
         with open("data.json", "w") as f:
             for line in lines:
                 if not line.startswith('{"name": "' + name + '"'):
                     f.write(line)
+                    bytes_written += len(line.encode("utf-8"))
+                else:
+                    deleted = json.loads(line)
+                    chunks.extend(CHUNK_STORE.calendar_digests(deleted["calendar_data"]))
+        CHUNK_STORE.release(chunks)
+
+        if PROFILER.enabled:
+            PROFILER.count(
+                "delete_calendar",
+                bytes_read=sum(len(line.encode("utf-8")) for line in lines),
+                bytes_written=bytes_written,
+            )
+
+        CalendarHistory(name).delete()
+
+
+class CalendarDaemon:
+    SOCKET_ENV_VAR = "ADCALENDAR_SOCKET"
+    SOCKET_PATH = "adcalendar.sock"
+    REQUEST_TIMEOUT = 5
+
+    def __init__(self: object, path="data.json"):
+        """
+        An instanced method to initialize class CalendarDaemon.
+        Keeps the parsed calendars and rendered tables in memory between requests.
+        The store is parsed again only when data.json changed on disk.
+        :param self: Expects instance of class CalendarDaemon
+        :param path: The json file calendars are stored in
+        :type self: object
+        :type path: str
+        """
+        self.path = path
+        self.calendars = {}
+        self.rendered = {}
+        self._signature = None
+
+    def _refresh(self: object):
+        """
+        Reparses data.json and drops the rendered tables if the file changed since the last request.
+        :param self: Expects instance of class CalendarDaemon
+        :type self: object
+        """
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+
+        self.calendars = {}
+        self.rendered = {}
+        if signature is not None:
+            self.calendars = load_calendars(self.path)
+        self._signature = signature
+
+    def _file_signature(self: object):
+        try:
+            file_stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (file_stat.st_mtime_ns, file_stat.st_size)
+
+    def _get_calendar(self: object, name: str) -> object:
+        if name not in self.calendars:
+            raise ValueError(f"Calendar '{name}' does not exist.")
+        # A copy, so a failed edit cannot change the cached calendar
+        return calendar_from_record(copy.deepcopy(self.calendars[name]))
+
+    def handle(self: object, request: dict):
+        """
+        Executes a single command sent by a client.
+        Supported commands: list, read (name, day, optional offset and limit), edit (name, day, data), render (name)
+        read answers with one page of data and the offset of the next page.
+        edit answers with the stored data, large entries shortened to a preview and their size.
+        :param self: Expects instance of class CalendarDaemon
+        :param request: The command and its arguments
+        :type self: object
+        :type request: dict
+        :return: The result of the command
+        :rtype: list or str
+        """
+        if not isinstance(request, dict):
+            raise ValueError("A request has to be a JSON object")
+        self._refresh()
+        command = request.get("command")
+        if command == "list":
+            return list(self.calendars)
+        elif command == "render":
+            name = request["name"]
+            if name not in self.rendered:
+                self.rendered[name] = self._get_calendar(name).render_month_table()
+            return self.rendered[name]
+        elif command == "read":
+            adCalendar = self._get_calendar(request["name"])
+            day = str(int(request["day"]))
+            if day not in adCalendar.calendar_data:
+                return {"data": f"No data stored for day {day}", "offset": 0, "size": 0}
+            if adCalendar.calendar_data[day] == [""]:
+                return {"data": f"No data found for day {day}", "offset": 0, "size": 0}
+            offset = int(request.get("offset", 0))
+            limit = int(request.get("limit", ChunkStore.CHUNK_SIZE))
+            if offset < 0 or limit < 1:
+                raise ValueError("Invalid offset or limit")
+            pages = adCalendar.read_data_pages(day, page_size=limit, offset=offset)
+            data = next(pages, "")
+            return {
+                "data": data,
+                "offset": offset + len(data),
+                "size": adCalendar.data_size(day),
+            }
+        elif command == "edit":
+            adCalendar = self._get_calendar(request["name"])
+            adCalendar.set_data_for_day(int(request["day"]), request["data"])
+            self.calendars[adCalendar.name] = dict(adCalendar.__dict__)
+            self.rendered.pop(adCalendar.name, None)
+            self._signature = self._file_signature()
+            return ", ".join(
+                item
+                if isinstance(item, str)
+                else f"{CHUNK_STORE.preview(item)}... ({CHUNK_STORE.size(item)} characters)"
+                for item in adCalendar.calendar_data[str(int(request["day"]))]
+            )
+        else:
+            raise ValueError(f"Unknown command '{command}'")
+
+    def create_server(self: object, socket_path: str) -> object:
+        """
+        Binds a server for this daemon to a Unix domain socket.
+        A connection carries one JSON request line and gets one JSON answer line with ok and result or error.
+        Clients that send nothing within REQUEST_TIMEOUT seconds are disconnected, so they cannot block others.
+        A stale socket left by a stopped daemon is replaced. Exits if the path is not a socket
+        or another daemon still answers on it.
+        :param self: Expects instance of class CalendarDaemon
+        :param socket_path: Path of the Unix domain socket
+        :type self: object
+        :type socket_path: str
+        :return: The bound server
+        :rtype: socketserver.UnixStreamServer
+        """
+        daemon = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            timeout = daemon.REQUEST_TIMEOUT
+
+            def handle(self):
+                try:
+                    line = self.rfile.readline()
+                except TimeoutError:
+                    return
+                if not line:
+                    return
+                try:
+                    response = {"ok": True, "result": daemon.handle(json.loads(line))}
+                except (ValueError, KeyError, TypeError, OSError) as e:
+                    response = {"ok": False, "error": str(e)}
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+        try:
+            path_stat = os.lstat(socket_path)
+        except FileNotFoundError:
+            path_stat = None
+        if path_stat is not None:
+            if not stat.S_ISSOCK(path_stat.st_mode):
+                sys.exit(f"'{socket_path}' exists and is not a socket.")
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(socket_path)
+                except ConnectionRefusedError:
+                    os.remove(socket_path)
+                else:
+                    sys.exit(f"A daemon is already listening on '{socket_path}'.")
+
+        return socketserver.UnixStreamServer(socket_path, RequestHandler)
+
+    def serve(self: object, socket_path: str):
+        """
+        Listens on a Unix domain socket until interrupted.
+        :param self: Expects instance of class CalendarDaemon
+        :param socket_path: Path of the Unix domain socket
+        :type self: object
+        :type socket_path: str
+        """
+        with self.create_server(socket_path) as server:
+            print(f"Serving calendars from {self.path} on {socket_path}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os.remove(socket_path)
 
 
 class Menu:
@@ -373,7 +1294,18 @@ def main():
     """
     Acts as the entry point for the program and controls the flow of the application.
     It provides a menu-driven interface for the user to interact with the calendar objects.
+    Pass --profile (or set ADCALENDAR_PROFILE=1) to dump a profiling report at exit.
+    Pass --daemon to serve calendars to client.py on a Unix domain socket instead.
     """
+    PROFILER.configure(sys.argv[1:])
+    if "--daemon" in sys.argv[1:]:
+        socket_path = os.environ.get(
+            CalendarDaemon.SOCKET_ENV_VAR, CalendarDaemon.SOCKET_PATH
+        )
+        # Stop like on Ctrl-C when terminated, so the socket file is removed
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        CalendarDaemon().serve(socket_path)
+        return
     menu = create_menu(
         "AdCalendar",
         [
@@ -387,34 +1319,44 @@ def main():
     while True:
         menu.display_menu()
         user_input = menu.get_selection()
-        if user_input == 1:
-            create_new_calendar()
-        elif user_input == 2:
-            adCalendar = print_available_calendars()
-            save_menu = create_menu(
-                "Save", ["Read entry", "Edit entry", "Back to main menu"]
-            )
-            while True:
-                save_menu.display_menu()
-                user_input_dialogue = save_menu.get_selection()
-                if user_input_dialogue == 1:
-                    user_day = input(
-                        "For which day do you want to read the data? Enter number: "
-                    )
-                    adCalendar.get_data_for_day(int(user_day))
-                elif user_input_dialogue == 2:
-                    day_data = adCalendar.edit_data_for_day()
-                    adCalendar.calendar_data = day_data
-                    read_json("y", adCalendar.name)
-                elif user_input_dialogue == 3:
-                    break
-        elif user_input == 3:
-            adCalendar = print_available_calendars(True)
-            Calendar.delete_calendar(adCalendar.name)
-        elif user_input == Menu.OPTION_QUIT:
-            sys.exit("Exit Application")
-
-
+        with PROFILER.capture(user_input):
+            if user_input == 1:
+                create_new_calendar()
+            elif user_input == 2:
+                adCalendar = print_available_calendars()
+                save_menu = create_menu(
+                    "Save",
+                    [
+                        "Read entry",
+                        "Edit entry",
+                        "Read entry from history",
+                        "Back to main menu",
+                    ],
+                )
+                while True:
+                    save_menu.display_menu()
+                    user_input_dialogue = save_menu.get_selection()
+                    if user_input_dialogue == 1:
+                        user_day = input(
+                            "For which day do you want to read the data? Enter number: "
+                        )
+                        adCalendar.get_data_for_day(int(user_day))
+                    elif user_input_dialogue == 2:
+                        day_data = adCalendar.edit_data_for_day()
+                        adCalendar.calendar_data = day_data
+                        read_json("y", adCalendar.name)
+                    elif user_input_dialogue == 3:
+                        read_history_entry(adCalendar)
+                    elif user_input_dialogue == 4:
+                        break
+            elif user_input == 3:
+                adCalendar = print_available_calendars(True)
+                Calendar.delete_calendar(adCalendar.name)
+            elif user_input == Menu.OPTION_QUIT:
+                sys.exit("Exit Application")
+
+
+@PROFILER.timed
 def is_calendar_name_unique(name: str) -> bool:
     """
     A static method to check if the calendar name inputs is unique (from data.json).
@@ -428,6 +1370,12 @@ def is_calendar_name_unique(name: str) -> bool:
         with open("data.json", "r") as file:
             for line in file:
                 calendar = json.loads(line)
+                if PROFILER.enabled:
+                    PROFILER.count(
+                        "is_calendar_name_unique",
+                        bytes_read=len(line.encode("utf-8")),
+                        records_parsed=1,
+                    )
                 if calendar["name"] == name:
                     return False
     except FileNotFoundError:
@@ -497,13 +1445,9 @@ def read_json(silent="n", selector="", delete=False) -> object:
     else:
         action_selector = "Which calendar do you want to load? Enter calendar Name: "
 
-    calendar_data = {}
     while True:
         try:
-            with open("data.json", "r") as file:
-                for line in file:
-                    calendar = json.loads(line)
-                    calendar_data[calendar["name"]] = calendar
+            calendar_data = load_calendars()
 
             if silent != "y":
                 print("***Available calendars***")
@@ -521,14 +1465,7 @@ def read_json(silent="n", selector="", delete=False) -> object:
 
             selected_calendar = calendar_data.get(selector)
             if selected_calendar != None:
-                adCalendar = Calendar(
-                    selected_calendar["name"],
-                    selected_calendar["_month"],
-                    selected_calendar["_year"],
-                    selected_calendar["_daysmonth"],
-                    selected_calendar["days"],
-                    selected_calendar["calendar_data"],
-                )
+                adCalendar = calendar_from_record(selected_calendar)
                 if delete is not True:
                     adCalendar.generate_month_table()
                 return adCalendar
@@ -540,6 +1477,76 @@ def read_json(silent="n", selector="", delete=False) -> object:
             return None
 
 
+@PROFILER.timed_as("read_json")
+def load_calendars(path="data.json") -> dict:
+    """
+    A function to parse all calendars stored in json (data.json).
+    Profiled as read_json, so the report does not include the time spent waiting for user input.
+    :param path: The json file calendars are stored in
+    :type path: str
+    :return: Stored calendars by name
+    :rtype: dict
+    """
+    calendars = {}
+    with open(path, "r") as file:
+        for line in file:
+            calendar = json.loads(line)
+            calendars[calendar["name"]] = calendar
+            if PROFILER.enabled:
+                PROFILER.count(
+                    "read_json",
+                    bytes_read=len(line.encode("utf-8")),
+                    records_parsed=1,
+                )
+    return calendars
+
+
+def calendar_from_record(record: dict) -> object:
+    """
+    A function to construct an object of class Calendar from a calendar stored in data.json.
+    :param record: A calendar as stored in data.json
+    :type record: dict
+    :return: A Calendar object
+    :rtype: Object
+    """
+    return Calendar(
+        record["name"],
+        record["_month"],
+        record["_year"],
+        record["_daysmonth"],
+        record["days"],
+        record["calendar_data"],
+    )
+
+
+def read_history_entry(adCalendar: object):
+    """
+    A function to read the data of a day as it was stored in an earlier version of a calendar.
+    Prints the available versions and reprompts on invalid input.
+    :param adCalendar: A calendar object
+    :type adCalendar: object
+    """
+    history = CalendarHistory(adCalendar.name)
+    versions = history.versions()
+    if not versions:
+        print(f"No history stored for calendar {adCalendar.name}")
+        return
+
+    table = [
+        (version, datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"))
+        for version, timestamp in versions
+    ]
+    print(tabulate(table, headers=["Version", "Saved at"], tablefmt="fancy_grid"))
+    while True:
+        try:
+            version = int(input("Which version do you want to read? Enter number: "))
+            day = int(input("For which day do you want to read the data? Enter number: "))
+            history.load(version).get_data_for_day(day)
+            return
+        except ValueError as e:
+            print(e)
+
+
 def get_calendar_name(adCalendar) -> object:
     """
     A function to prompt the user for calendar name to create a calendar
@@ -638,5 +1645,28 @@ def get_days_month(year: str, month: str) -> int:
     return dmonth
 
 
+def write_atomic(path: str, text: str):
+    """
+    A function to write a file so that it is either complete or missing, never truncated.
+    Writes to a temporary file in the same folder and renames it.
+    Used for chunk and history files, profiled as write_atomic.
+    :param path: The file to write
+    :param text: The content of the file
+    :type path: str
+    :type text: str
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    if PROFILER.enabled:
+        PROFILER.count("write_atomic", calls=1, bytes_written=len(text.encode("utf-8")))
+
+
 if __name__ == "__main__":
     main()
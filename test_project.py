@@ -1,5 +1,17 @@
+import socket
+import threading
 import pytest
-from project import Calendar, get_days_month, create_menu, is_calendar_name_unique
+from client import build_request, send_request
+from project import (
+    Calendar,
+    get_days_month,
+    create_menu,
+    is_calendar_name_unique,
+    PROFILER,
+    load_calendars,
+    CalendarHistory,
+    CalendarDaemon,
+)
 
 
 def test_calendar_initialization():
@@ -94,3 +106,263 @@ def test_is_calendar_name_unique():
     # Those names need to exist in 'data.json' to be able to test!
     assert is_calendar_name_unique("TestCalendar2") == True
     assert is_calendar_name_unique("TestCalendar") == False
+
+
+def test_profiler_counts_instrumented_calls(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    profiler = PROFILER
+    monkeypatch.setattr(profiler, "enabled", True)
+    monkeypatch.setattr(profiler, "stats", {})
+    calendar = Calendar(
+        name="ProfiledCalendar",
+        month="January",
+        year="2021",
+        daysmonth=1,
+        calendar_data={"1": ["Café at 10 AM ☕"]},
+    )
+    calendar.save_to_json()
+    assert is_calendar_name_unique("ProfiledCalendar") == False
+    assert "ProfiledCalendar" in load_calendars()
+    calendar.generate_month_table()
+
+    file_size = (tmp_path / "data.json").stat().st_size
+    report = profiler.report()
+    assert report["save_to_json"]["calls"] == 1
+    assert report["save_to_json"]["bytes_read"] == 0
+    assert report["save_to_json"]["bytes_written"] == file_size
+    assert report["write_atomic"]["bytes_written"] > 0
+    assert report["is_calendar_name_unique"]["records_parsed"] == 1
+    assert report["is_calendar_name_unique"]["bytes_read"] == file_size
+    assert report["read_json"]["calls"] == 1
+    assert report["read_json"]["bytes_read"] == file_size
+    assert report["generate_month_table"]["calls"] == 1
+    assert report["generate_month_table"]["records_parsed"] == 1
+    assert "render_month_table" not in report
+
+    calendar.save_to_json()
+    assert profiler.report()["save_to_json"]["bytes_read"] == file_size
+
+    monkeypatch.setattr(profiler, "report_path", str(tmp_path / "report.json"))
+    profiler.dump()
+    assert (tmp_path / "report.json").exists()
+
+
+def test_calendar_history_shares_unchanged_days(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calendar = Calendar(
+        name="HistoryCalendar",
+        month="January",
+        year="2021",
+        daysmonth=2,
+        calendar_data={"1": ["Meeting at 10 AM"], "2": ["Lunch"]},
+    )
+    calendar.save_to_json()
+    calendar.calendar_data = {"1": ["Meeting at 11 AM"], "2": ["Lunch"]}
+    calendar.save_to_json()
+
+    history = CalendarHistory("HistoryCalendar")
+    assert [version for version, _ in history.versions()] == [1, 2]
+    # Day 2 did not change, so three entries are stored for two versions
+    assert len(list((tmp_path / history.objects_path).iterdir())) == 3
+    assert history.load(1).calendar_data["1"] == ["Meeting at 10 AM"]
+    assert history.load().calendar_data["1"] == ["Meeting at 11 AM"]
+    first_saved = history.versions()[0][1]
+    assert history.load(timestamp=first_saved).calendar_data["1"] == ["Meeting at 10 AM"]
+
+    history.keep = 1
+    history.prune()
+    assert [version for version, _ in history.versions()] == [2]
+    assert len(list((tmp_path / history.objects_path).iterdir())) == 2
+    with pytest.raises(ValueError):
+        history.load(1)
+
+    # Saving with keep=1 drops version 2 and the entry only it referenced
+    calendar.calendar_data = {"1": ["Meeting at 12 AM"], "2": ["Lunch"]}
+    CalendarHistory("HistoryCalendar", keep=1).commit(calendar)
+    assert [version for version, _ in history.versions()] == [3]
+    assert len(list((tmp_path / history.objects_path).iterdir())) == 2
+
+    # Entries missing from REFS are kept instead of failing the prune
+    CalendarHistory("HistoryCalendar").commit(calendar)
+    assert [version for version, _ in history.versions()] == [3, 4]
+    (tmp_path / history.path / "REFS").write_text("{}")
+    CalendarHistory("HistoryCalendar", keep=1).prune()
+    assert [version for version, _ in history.versions()] == [4]
+    assert history.load().calendar_data["1"] == ["Meeting at 12 AM"]
+
+
+def test_delete_calendar_removes_history(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calendar = Calendar(
+        name="DeletedCalendar",
+        month="January",
+        year="2021",
+        daysmonth=1,
+        calendar_data={"1": ["old secret"]},
+    )
+    calendar.save_to_json()
+    Calendar.delete_calendar("DeletedCalendar")
+
+    history = CalendarHistory("DeletedCalendar")
+    assert not (tmp_path / history.path).exists()
+    assert history.is_empty()
+
+
+def test_large_entries_are_stored_out_of_line(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    large_note = "x" * 200_000
+    calendar = Calendar(
+        name="LargeCalendar",
+        month="January",
+        year="2021",
+        daysmonth=2,
+        calendar_data={"1": [large_note], "2": ["Lunch"]},
+    )
+    calendar.save_to_json()
+
+    assert (tmp_path / "data.json").stat().st_size < 1000
+    assert calendar.calendar_data["1"][0]["size"] == len(large_note)
+    assert calendar.calendar_data["2"] == ["Lunch"]
+    assert calendar.day_has_data(1)
+
+    pages = list(calendar.read_data_pages(1, page_size=50_000))
+    assert len(pages) == 4
+    assert "".join(pages) == large_note
+    assert calendar.get_data_for_day(1) == len(large_note)
+    assert not list(tmp_path.glob("chunks/*.tmp"))
+
+    calendar.calendar_data["1"].append("Lunch")
+    tail = "".join(calendar.read_data_pages(1, offset=len(large_note) - 3))
+    assert tail == "xxx, Lunch"
+    assert calendar.data_size(1) == len(large_note) + len(", Lunch")
+
+
+def test_calendar_daemon_commands(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Calendar(
+        name="DaemonCalendar",
+        month="January",
+        year="2021",
+        daysmonth=2,
+        calendar_data={"1": ["Meeting at 10 AM"], "2": [""]},
+    ).save_to_json()
+
+    daemon = CalendarDaemon()
+    assert daemon.handle({"command": "list"}) == ["DaemonCalendar"]
+    read_day_1 = {"command": "read", "name": "DaemonCalendar", "day": 1}
+    read_day_2 = {"command": "read", "name": "DaemonCalendar", "day": 2}
+    render = {"command": "render", "name": "DaemonCalendar"}
+    assert daemon.handle(read_day_1)["data"] == "Meeting at 10 AM"
+    assert daemon.handle(dict(read_day_1, offset=8, limit=2)) == {
+        "data": "at",
+        "offset": 10,
+        "size": 16,
+    }
+    assert daemon.handle(read_day_2)["data"] == "No data found for day 2"
+    assert "2!" not in daemon.handle(render)
+
+    daemon.handle({"command": "edit", "name": "DaemonCalendar", "day": 2, "data": "Lunch"})
+    assert daemon.handle(read_day_2)["data"] == "Lunch"
+    assert "2!" in daemon.handle(render)
+    with pytest.raises(ValueError):
+        daemon.handle({"command": "edit", "name": "DaemonCalendar", "day": 3, "data": "x"})
+
+    # A failed save must not change the cached calendar
+    def failing_save(self):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(Calendar, "save_to_json", failing_save)
+    with pytest.raises(OSError):
+        daemon.handle({"command": "edit", "name": "DaemonCalendar", "day": 2, "data": "UNSAVED"})
+    assert daemon.handle(read_day_2)["data"] == "Lunch"
+    with pytest.raises(ValueError):
+        daemon.handle([])
+
+
+def test_calendar_daemon_socket_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(CalendarDaemon, "REQUEST_TIMEOUT", 0.2)
+    Calendar(
+        name="SocketCalendar",
+        month="January",
+        year="2021",
+        daysmonth=1,
+        calendar_data={"1": ["Meeting at 10 AM"]},
+    ).save_to_json()
+    socket_path = str(tmp_path / "daemon.sock")
+    server = CalendarDaemon().create_server(socket_path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        assert send_request(build_request(["list"]), socket_path) == {
+            "ok": True,
+            "result": ["SocketCalendar"],
+        }
+        # An idle client is disconnected instead of blocking the others
+        idle = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        idle.connect(socket_path)
+        response = send_request(build_request(["edit", "SocketCalendar", "1", "Lunch"]), socket_path)
+        assert response == {"ok": True, "result": "Lunch"}
+        idle.close()
+
+        large_note = "x" * 5000
+        response = send_request(
+            build_request(["edit", "SocketCalendar", "1", large_note]), socket_path
+        )
+        assert response["result"] == "x" * 80 + "... (5000 characters)"
+        response = send_request(build_request(["read", "SocketCalendar", "1"]), socket_path)
+        assert response["result"]["data"] == large_note
+
+        send_request(build_request(["edit", "SocketCalendar", "1", "Lunch"]), socket_path)
+        response = send_request(build_request(["read", "SocketCalendar", "1"]), socket_path)
+        assert response["result"]["data"] == "Lunch"
+        assert send_request([], socket_path)["ok"] == False
+        assert send_request(build_request(["render", "Nope"]), socket_path)["ok"] == False
+
+        # A second daemon must not take over the socket of a running one
+        with pytest.raises(SystemExit):
+            CalendarDaemon().create_server(socket_path)
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+    # The socket is stale now and gets replaced, a regular file is never removed
+    CalendarDaemon().create_server(socket_path).server_close()
+    (tmp_path / "notasock").write_text("keep me")
+    with pytest.raises(SystemExit):
+        CalendarDaemon().create_server(str(tmp_path / "notasock"))
+    assert (tmp_path / "notasock").read_text() == "keep me"
+
+
+def test_build_request_usage_errors():
+    assert build_request(["read", "Calendar", "3"]) == {
+        "command": "read",
+        "name": "Calendar",
+        "day": 3,
+    }
+    for args in [[], ["list", "extra"], ["read", "Calendar"], ["read", "Calendar", "x"], ["bogus"]]:
+        with pytest.raises(ValueError):
+            build_request(args)
+
+
+def test_chunks_are_released_with_history_and_calendar(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calendar = Calendar(
+        name="Big",
+        month="January",
+        year="2021",
+        daysmonth=1,
+        calendar_data={"1": ["0" * 5000]},
+    )
+    calendar.save_to_json()
+    for edit in range(1, 61):
+        calendar.set_data_for_day(1, str(edit) * 5000)
+
+    # 61 versions were saved, the 50 kept ones reference one chunk each
+    chunk_files = lambda: list(tmp_path.glob("chunks/*.txt"))
+    assert len(chunk_files()) == CalendarHistory.KEEP_VERSIONS
+    assert calendar.get_data_for_day(1) == 10_000
+
+    Calendar.delete_calendar("Big")
+    assert chunk_files() == []